@@ -13,6 +13,15 @@ class Settings(BaseSettings):
     docker_postgres_host: str           # Адрес хоста Postgres внутри сети Docker
     postgres_port: int                  # Порт Postgres
     postgres_db_name: str               # Имя базы данных Postgres
+    redis_host: str = "localhost"       # Адрес хоста Redis
+    redis_port: int = 6379              # Порт Redis
+    redis_db: int = 0                   # Номер базы данных Redis
+    redis_password: str | None = None   # Пароль Redis
+    redis_ssl: bool = False             # Подключение к Redis по TLS
+    redis_socket_timeout: float = 0.5   # Таймаут операций с Redis, секунды
+    redis_reconnect_interval_seconds: float = 5     # Пауза перед повторной подпиской на канал инвалидации
+    user_cache_ttl_seconds: int = 300               # Время жизни записи пользователя в Redis (L2)
+    user_cache_local_ttl_seconds: int = 30          # Время жизни записи пользователя в памяти процесса (L1)
 
     def get_db_url(self):
         return (f"postgresql+psycopg2://{self.postgres_user}:{self.postgres_password}@"
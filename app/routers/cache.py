@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+from typing import Any, Callable
+
+import redis
+from redis.exceptions import RedisError, WatchError
+
+from app.config import settings
+
+"""
+
+Данный модуль реализует двухуровневый кэш записей пользователей.
+
+L1 - локальный словарь в памяти процесса, L2 - общее хранилище с протоколом Redis.
+В кэш попадает только публичная проекция пользователя (без хэша пароля).
+При создании, изменении и удалении пользователя ключи удаляются из L2, счетчики поколений
+ключей увеличиваются, а всем воркерам через pub/sub рассылается сообщение, по которому они
+очищают свой L1. Запись в кэш после загрузки из БД выполняется только если поколение ключа
+не изменилось за время загрузки, поэтому устаревшая строка не может вернуться в кэш.
+Если хранилище недоступно, кэш не используется и данные читаются напрямую из БД.
+Инвалидация, которую не удалось выполнить из-за ошибки Redis, сохраняется в очереди воркера
+и повторяется при следующем успешном обращении к Redis.
+
+"""
+
+INVALIDATION_CHANNEL = "users:invalidate"
+
+
+def create_redis_client():
+    return redis.Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        password=settings.redis_password,
+        ssl=settings.redis_ssl,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+    )
+
+
+class UserCache:
+    """ Двухуровневый кэш (L1 в памяти процесса + L2 в Redis) для записей таблицы пользователей """
+
+    def __init__(
+            self,
+            model: type,
+            client: Any,
+            ttl: int = settings.user_cache_ttl_seconds,
+            local_ttl: int = settings.user_cache_local_ttl_seconds,
+            cooldown: float = settings.redis_reconnect_interval_seconds,
+            channel: str = INVALIDATION_CHANNEL,
+    ):
+        """
+        :param model: Pydantic-модель публичной проекции пользователя, которая хранится в кэше
+        :param client: Клиент Redis (или любой совместимый объект, например fakeredis.FakeRedis)
+        :param ttl: Время жизни записи в L2, секунды
+        :param local_ttl: Время жизни записи в L1, секунды
+        :param cooldown: Время, на которое L2 отключается после ошибки Redis, секунды
+        :param channel: Канал pub/sub для сообщений об инвалидации
+        """
+        self.model = model
+        self.client = client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.cooldown = cooldown
+        self.channel = channel
+        self._local: dict[str, tuple[float, str]] = {}
+        # Локальные поколения ключей и эпоха подписки защищают L1 от записи данных,
+        # прочитанных до пришедшей инвалидации или до потери подписки
+        self._local_gen: dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        # L1 используется только пока есть подписка на канал инвалидации,
+        # иначе локальные данные могут устареть относительно других воркеров
+        self._subscribed = False
+        self._down_until = 0.0
+        # Ключи, инвалидацию которых не удалось выполнить в Redis
+        self._pending: set[str] = set()
+        self._stop = threading.Event()
+        self._listener: threading.Thread | None = None
+
+    @staticmethod
+    def _key(field: str, value: Any) -> str:
+        return f"user:{field}:{value}"
+
+    @staticmethod
+    def _gen_key(key: str) -> str:
+        # Счетчики поколений лежат под отдельным префиксом, чтобы username вида "bob:gen"
+        # не мог совпасть с ключом счетчика другого пользователя
+        return f"user-gen:{key.removeprefix('user:')}"
+
+    def _project(self, user):
+        return self.model.model_validate(user, from_attributes=True)
+
+    def _load(self, raw: str | bytes):
+        return self.model.model_validate(json.loads(raw))
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self):
+        self._down_until = time.monotonic() + self.cooldown
+
+    def _local_token(self, key: str) -> tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._local_gen.get(key, 0)
+
+    def _local_get(self, key: str) -> str | None:
+        with self._lock:
+            if not self._subscribed:
+                return None
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            return raw
+
+    def _local_set(self, key: str, raw: str, token: tuple[int, int]):
+        with self._lock:
+            if not self._subscribed or token != (self._epoch, self._local_gen.get(key, 0)):
+                return
+            self._local[key] = (time.monotonic() + self.local_ttl, raw)
+
+    def _local_evict(self, keys: list[str]):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+                self._local_gen[key] = self._local_gen.get(key, 0) + 1
+
+    def _local_reset(self, subscribed: bool):
+        with self._lock:
+            self._subscribed = subscribed
+            self._local.clear()
+            self._local_gen.clear()
+            self._epoch += 1
+
+    def _keys_for(self, user_id: int | None, usernames: tuple[str | None, ...]) -> list[str]:
+        keys = []
+        if user_id is not None:
+            keys.append(self._key("id", user_id))
+        keys.extend(self._key("username", username) for username in usernames if username)
+        return keys
+
+    def get(self, field: str, value: Any, loader: Callable[[], Any]):
+        """
+        Получение пользователя по полю id или username. Сначала проверяется L1, затем L2,
+        при промахе вызывается loader (запрос в БД) и результат сохраняется в оба уровня.
+        :param field: Название поля поиска ("id" или "username")
+        :param value: Значение поля
+        :param loader: Функция без аргументов, загружающая пользователя из БД
+        :return: Публичная проекция пользователя или None
+        """
+        key = self._key(field, value)
+        raw = self._local_get(key)
+        if raw is not None:
+            try:
+                return self._load(raw)
+            except ValueError:
+                self._local_evict([key])
+        token = self._local_token(key)
+        if not self._available() or not self._flush_pending():
+            return self._load_from_db(loader)
+        try:
+            raw, gen = self.client.mget(key, self._gen_key(key))
+        except RedisError:
+            self._mark_down()
+            return self._load_from_db(loader)
+        if raw is not None:
+            try:
+                user = self._load(raw)
+            except ValueError:
+                # Поврежденная или устаревшая по схеме запись - удаляем и читаем из БД
+                self._delete(key)
+            else:
+                self._local_set(key, raw.decode() if isinstance(raw, bytes) else raw, token)
+                return user
+        user = self._load_from_db(loader)
+        if user is not None:
+            self._store(key, gen, user, token)
+        return user
+
+    def _load_from_db(self, loader: Callable[[], Any]):
+        user = loader()
+        return None if user is None else self._project(user)
+
+    def _delete(self, key: str):
+        try:
+            self.client.delete(key)
+        except RedisError:
+            self._mark_down()
+
+    def _store(self, key: str, gen: bytes | None, user, token: tuple[int, int]):
+        """ Запись в L2 и L1, если поколение ключа не изменилось с момента чтения из L2 """
+        raw = user.model_dump_json()
+        gen_key = self._gen_key(key)
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(gen_key)
+                if pipe.get(gen_key) != gen:
+                    return
+                pipe.multi()
+                pipe.set(key, raw, ex=self.ttl)
+                pipe.execute()
+        except WatchError:
+            return
+        except RedisError:
+            self._mark_down()
+            return
+        self._local_set(key, raw, token)
+
+    def invalidate(self, user_id: int | None, *usernames: str | None):
+        """
+        Удаление пользователя из кэша и рассылка сообщения об инвалидации остальным воркерам.
+        :param user_id: Идентификатор пользователя
+        :param usernames: Имена пользователя (старое и новое при переименовании)
+        """
+        keys = self._keys_for(user_id, usernames)
+        self._local_evict(keys)
+        if keys:
+            self._publish_invalidation(keys)
+
+    def _publish_invalidation(self, keys: list[str]) -> bool:
+        """ Удаление ключей из L2, увеличение их поколений и рассылка сообщения об инвалидации """
+        try:
+            with self.client.pipeline(transaction=True) as pipe:
+                pipe.delete(*keys)
+                for key in keys:
+                    pipe.incr(self._gen_key(key))
+                    pipe.expire(self._gen_key(key), self.ttl)
+                pipe.publish(self.channel, json.dumps(keys))
+                pipe.execute()
+            return True
+        except RedisError:
+            # Пока инвалидация не выполнена, другие воркеры могут отдавать старую запись из L2.
+            # Ключи остаются в очереди и повторно инвалидируются при следующем обращении к Redis
+            with self._lock:
+                self._pending.update(keys)
+            self._mark_down()
+            return False
+
+    def _flush_pending(self) -> bool:
+        """ Повтор неудавшихся инвалидаций. Возвращает False, если Redis по-прежнему недоступен """
+        with self._lock:
+            keys = sorted(self._pending)
+            self._pending.clear()
+        return not keys or self._publish_invalidation(keys)
+
+    def _handle_message(self, message: dict):
+        if message.get("type") != "message":
+            return
+        try:
+            keys = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        self._local_evict(keys)
+
+    def _listen(self):
+        """ Цикл подписки на канал инвалидации. При потере соединения L1 сбрасывается и отключается. """
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._local_reset(subscribed=True)
+                self._flush_pending()
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle_message(message)
+                    if self._pending and self._available():
+                        self._flush_pending()
+            except RedisError:
+                self._mark_down()
+            finally:
+                self._local_reset(subscribed=False)
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except RedisError:
+                        pass
+            self._stop.wait(self.cooldown)
+
+    def start(self):
+        """ Запуск фонового потока, слушающего канал инвалидации """
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="user-cache-listener", daemon=True)
+        self._listener.start()
+
+    def stop(self):
+        """ Остановка фонового потока """
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
@@ -12,6 +12,7 @@ import jwt
 
 from ..config import settings
 from .db_connection import create_database
+from .cache import UserCache, create_redis_client
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -89,10 +90,15 @@ def get_session():
 SessionDep = Annotated[Session, Depends(get_session)]
 
 
+user_cache = UserCache(UserPublic, create_redis_client())
+
+
 @asynccontextmanager
 async def lifespan(router: APIRouter):
     create_db_and_tables()
+    user_cache.start()
     yield
+    user_cache.stop()
 
 
 router = APIRouter(
@@ -121,6 +127,7 @@ def create_user(
         session.add(db_user)
         session.commit()
         session.refresh(db_user)
+        user_cache.invalidate(db_user.id, db_user.username)
         return {"message": "user is created"}
     except IntegrityError as e:
         return {"message": "Oops, the data you wrote refers to an existing user. Try again",
@@ -177,7 +184,7 @@ def update_user(
     :param user_id: Параметр пути, обозначающий идентификатор искомого пользователя.
     :return: Объект пользователь, валидируемый моделью UserPublic
     """
-    user_db = session.get(UserTable, user_id)
+    user_db = user_cache.get("id", user_id, lambda: session.get(UserTable, user_id))
     if not user_db:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     return user_db
@@ -207,6 +214,7 @@ def update_user(
     user_db = session.get(UserTable, user_id)
     if not user_db:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    old_username = user_db.username
     user_data = user.model_dump(exclude_unset=True)
     extra_data = {}
     if "password" in user_data:
@@ -217,6 +225,7 @@ def update_user(
     session.add(user_db)
     session.commit()
     session.refresh(user_db)
+    user_cache.invalidate(user_id, old_username, user_db.username)
     return user_db
 
 
@@ -241,6 +250,8 @@ def delete_user(
     user = session.get(UserTable, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    username = user.username
     session.delete(user)
     session.commit()
+    user_cache.invalidate(user_id, username)
     return {"ok": True}
@@ -5,6 +5,7 @@ from functools import lru_cache
 
 import jwt
 from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.security.utils import get_authorization_scheme_param
@@ -14,7 +15,7 @@ from pydantic import BaseModel
 from sqlalchemy.exc import InvalidRequestError
 from sqlmodel import create_engine, Session, select, SQLModel
 
-from .db import UserTable, SessionDep
+from .db import UserTable, SessionDep, user_cache
 from ..config import settings, Settings
 
 
@@ -151,7 +152,15 @@ async def verify_token(
             detail="Token is invalid",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = get_user(token_data.username, session)
+    # Для проверки токена достаточно публичных данных, поэтому пользователь берется из кэша.
+    # Проверка пароля (authenticate_user) всегда выполняется по данным из БД.
+    # Обращения к Redis и БД синхронные, поэтому выполняются в пуле потоков.
+    user = await run_in_threadpool(
+        user_cache.get,
+        "username",
+        token_data.username,
+        lambda: get_user(token_data.username, session)
+    )
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,15 @@
+import os
+
+# Значения обязательных настроек, чтобы app.config импортировался без файла .env
+for name, value in {
+    "SECRET_KEY": "test",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_HOST": "localhost",
+    "DOCKER_POSTGRES_HOST": "postgres",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_DB_NAME": "test_task_2",
+}.items():
+    os.environ.setdefault(name, value)
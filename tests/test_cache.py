@@ -0,0 +1,181 @@
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from pydantic import BaseModel
+
+from app.routers.cache import UserCache
+
+
+class UserPublic(BaseModel):
+    """ Упрощенная публичная модель пользователя (без зависимости от SQLModel) """
+    id: int
+    username: str
+    is_admin: bool = False
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class Db:
+    """ Заглушка БД: хранит строки пользователей и считает количество запросов """
+
+    def __init__(self):
+        self.rows = {1: SimpleNamespace(id=1, username="bob", is_admin=True, hashed_password="h1")}
+        self.calls = 0
+
+    def by_id(self, user_id):
+        def loader():
+            self.calls += 1
+            return self.rows.get(user_id)
+        return loader
+
+    def by_username(self, username):
+        def loader():
+            self.calls += 1
+            return next((row for row in self.rows.values() if row.username == username), None)
+        return loader
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def db():
+    return Db()
+
+
+@pytest.fixture
+def workers(server):
+    caches = [UserCache(UserPublic, fakeredis.FakeRedis(server=server), cooldown=0.1) for _ in range(2)]
+    for cache in caches:
+        cache.start()
+    assert wait_for(lambda: all(cache._subscribed for cache in caches))
+    yield caches
+    for cache in caches:
+        cache.stop()
+
+
+def test_l1_and_l2_hits(workers, db):
+    a, b = workers
+    assert a.get("id", 1, db.by_id(1)).username == "bob"
+    assert a.get("id", 1, db.by_id(1)).username == "bob"
+    assert b.get("id", 1, db.by_id(1)).username == "bob"
+    assert db.calls == 1
+    assert "user:id:1" in a._local
+    assert "user:id:1" in b._local
+
+
+def test_hash_is_not_cached(workers, db, server):
+    a, _ = workers
+    user = a.get("id", 1, db.by_id(1))
+    assert not hasattr(user, "hashed_password")
+    assert b"h1" not in fakeredis.FakeRedis(server=server).get("user:id:1")
+
+
+def test_invalidation_reaches_other_worker(workers, db):
+    a, b = workers
+    b.get("id", 1, db.by_id(1))
+    db.rows[1].is_admin = False
+    a.invalidate(1, "bob")
+    assert wait_for(lambda: "user:id:1" not in b._local)
+    assert b.get("id", 1, db.by_id(1)).is_admin is False
+
+
+def test_rename_evicts_old_and_new_username(workers, db):
+    a, b = workers
+    b.get("username", "bob", db.by_username("bob"))
+    b.get("username", "alice", db.by_username("alice"))
+    db.rows[1].username = "alice"
+    a.invalidate(1, "bob", "alice")
+    assert wait_for(lambda: not b._local)
+    assert b.get("username", "bob", db.by_username("bob")) is None
+    assert b.get("username", "alice", db.by_username("alice")).id == 1
+
+
+def test_fallback_when_server_is_down(server, db):
+    cache = UserCache(UserPublic, fakeredis.FakeRedis(server=server), cooldown=60)
+    server.connected = False
+    assert cache.get("id", 1, db.by_id(1)).username == "bob"
+    assert db.calls == 1
+    # В период cooldown обращений к Redis нет, данные читаются из БД
+    assert not cache._available()
+    assert cache.get("id", 1, db.by_id(1)).username == "bob"
+    assert db.calls == 2
+    # Неудачная инвалидация не выбрасывает исключение, не обращается к БД и откладывается в очередь
+    cache.invalidate(1, "bob")
+    assert db.calls == 2
+    assert not cache._available()
+    assert cache._pending == {"user:id:1", "user:username:bob"}
+
+
+def test_l1_disabled_and_cleared_when_subscription_drops(workers, db, server):
+    a, _ = workers
+    a.get("id", 1, db.by_id(1))
+    assert a._local
+    server.connected = False
+    assert wait_for(lambda: not a._subscribed)
+    assert not a._local
+    assert a.get("id", 1, db.by_id(1)).username == "bob"
+    assert not a._local
+    server.connected = True
+    assert wait_for(lambda: a._subscribed)
+
+
+def test_stale_row_is_not_written_back_after_invalidation(workers, db):
+    a, b = workers
+
+    def racing_loader():
+        # Читатель получил старую строку, после чего пользователь обновился и кэш был инвалидирован
+        row = SimpleNamespace(**vars(db.rows[1]))
+        db.rows[1].is_admin = False
+        b.invalidate(1, "bob")
+        return row
+
+    assert a.get("username", "bob", racing_loader).is_admin is True
+    assert a.get("username", "bob", db.by_username("bob")).is_admin is False
+    assert wait_for(lambda: b.get("username", "bob", db.by_username("bob")).is_admin is False)
+
+
+def test_corrupt_entry_falls_back_to_loader(workers, db, server):
+    a, _ = workers
+    fakeredis.FakeRedis(server=server).set("user:id:1", b'{"id": "not-an-int"}')
+    assert a.get("id", 1, db.by_id(1)).username == "bob"
+    assert db.calls == 1
+    assert a.get("id", 1, db.by_id(1)).username == "bob"
+    assert db.calls == 1
+
+
+def test_failed_invalidation_is_retried(workers, db, server):
+    a, b = workers
+    b.get("id", 1, db.by_id(1))
+    server.connected = False
+    db.rows[1].is_admin = False
+    a.invalidate(1, "bob")
+    assert a._pending
+    server.connected = True
+    assert wait_for(lambda: not a._pending)
+    assert fakeredis.FakeRedis(server=server).get("user:id:1") is None
+    assert wait_for(lambda: b.get("id", 1, db.by_id(1)).is_admin is False)
+
+
+def test_username_cannot_collide_with_generation_key(workers, db):
+    a, b = workers
+    db.rows[2] = SimpleNamespace(id=2, username="bob:gen", is_admin=False, hashed_password="h2")
+    a.get("username", "bob", db.by_username("bob"))
+    a.invalidate(1, "bob")
+    assert a.get("username", "bob:gen", db.by_username("bob:gen")).id == 2
+    assert a._available()
+    b.invalidate(1, "bob")
+    assert a._available() and b._available()
+    assert not a._pending and not b._pending
+    assert a.get("username", "bob", db.by_username("bob")).id == 1